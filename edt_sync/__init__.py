@@ -0,0 +1,5 @@
+"""Synchronise a school timetable into an iCalendar file (see edt_sync.core)."""
+
+from edt_sync.core import main
+
+__all__ = ["main"]
@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synchronise a school timetable and produce an iCalendar file for subscription.
+
+This script is designed to be run from a GitHub Action or any other cron-like
+environment. It logs into a school portal using credentials supplied via
+environment variables, retrieves the user's events by mimicking the browser's
+AJAX call and exports them as a `.ics` file into the `docs/` directory.
+
+You must supply the following environment variables:
+
+  - USERNAME / PASSWORD: your login credentials for the school portal. In a
+    GitHub Action, these should be stored as repository secrets (for example
+    ENT_USERNAME and ENT_PASSWORD) and mapped via the workflow file.
+  - LOGIN_URL: the URL for the login form of your school's ENT.
+  - ENT_EVENTS_URL: the URL of the planning page (e.g. `faces/Planning.xhtml`).
+    The script uses this page to extract the dynamic `ViewState` token and
+    to send an AJAX POST that returns event data. You may need to adapt the
+    `fetch_events` function if your ENT uses different parameters.
+
+You can customise the frequency of synchronisation by adjusting the cron
+expression in your GitHub Action. By default, the example workflow runs every
+10 hours.
+"""
+
+import hashlib
+import os
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlencode, quote_plus
+from zoneinfo import ZoneInfo
+
+import httpx
+import ijson
+from lxml import etree, html as lxml_html
+
+# Timezone for all events. Modify if needed.
+TIMEZONE = ZoneInfo("Europe/Paris")
+
+# Rolling window of weeks to synchronise, as day offsets from the current week:
+# the previous week plus the next four, so subscribers also see future events.
+WEEK_OFFSETS = (-7, 0, 7, 14, 21)
+
+# Read environment variables. These must be provided in the runner environment.
+USERNAME = os.getenv("USERNAME")
+PASSWORD = os.getenv("PASSWORD")
+LOGIN_URL = os.getenv("LOGIN_URL", "")
+# ENT_EVENTS_URL points to the Planning.xhtml page. It is used to both
+# retrieve the ViewState token and perform the AJAX POST to fetch events.
+ENT_EVENTS_URL = os.getenv("ENT_EVENTS_URL", "")
+
+def login(client: httpx.Client) -> None:
+    """Authenticate to the portal. Raises an exception if login fails."""
+    if not USERNAME or not PASSWORD:
+        raise ValueError(
+            "USERNAME and PASSWORD environment variables must be set."
+        )
+    if not LOGIN_URL:
+        raise ValueError("LOGIN_URL environment variable must be set.")
+    payload = {"username": USERNAME, "password": PASSWORD}
+    resp = client.post(LOGIN_URL, data=payload)
+    resp.raise_for_status()
+
+# Cached ViewState, planning-page ETag and session cookies, persisted between
+# runs (see actions/cache in the workflow). Lets the happy path skip the
+# initial GET of the planning page.
+VIEWSTATE_CACHE_PATH = os.path.join("docs", ".viewstate.json")
+
+def _load_cache(client: httpx.Client) -> Dict:
+    """Load the ViewState/ETag cache saved by a previous run, if any."""
+    try:
+        with open(VIEWSTATE_CACHE_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    client.cookies.update(cache.get("cookies", {}))
+    return cache
+
+def _save_cache(client: httpx.Client, viewstate: str, etag: str) -> None:
+    """Persist the ViewState, ETag and cookies for the next run."""
+    os.makedirs(os.path.dirname(VIEWSTATE_CACHE_PATH), exist_ok=True)
+    with open(VIEWSTATE_CACHE_PATH, "w", encoding="utf-8") as f:
+        json.dump(
+            {"vs": viewstate, "etag": etag, "cookies": dict(client.cookies)}, f
+        )
+
+# Fallback pattern, compiled once at import; matching on bytes avoids decoding
+# the whole planning page to str just to find the token.
+_VS_RE = re.compile(rb'name="javax\.faces\.ViewState" value="([^"]+)"')
+
+_VS_XPATH = 'string(//input[@name="javax.faces.ViewState"]/@value)'
+
+def _extract_viewstate(html_bytes: bytes) -> str:
+    """Extract the javax.faces.ViewState value from the planning HTML page.
+
+    The page is parsed with lxml (C-level, tolerant of broken markup) and the
+    token pulled out with a targeted XPath; the regex scan is kept as a
+    fallback for pages lxml cannot make sense of.
+    """
+    try:
+        viewstate = lxml_html.fromstring(html_bytes).xpath(_VS_XPATH)
+    except etree.LxmlError:
+        viewstate = ""
+    if viewstate:
+        return viewstate
+    match = _VS_RE.search(html_bytes)
+    if not match:
+        raise RuntimeError("Could not find ViewState token on the planning page")
+    return match.group(1).decode("ascii")
+
+# Constant part of the AJAX form payload, based on the captured cURL, encoded
+# once at import. The per-call fields are appended in _post_events.
+_STATIC_PAYLOAD = urlencode(
+    {
+        "javax.faces.partial.ajax": "true",
+        "javax.faces.source": "form:j_idt117",
+        "javax.faces.partial.execute": "form:j_idt117",
+        "javax.faces.partial.render": "form:j_idt117",
+        "form:j_idt117": "form:j_idt117",
+        "form": "form",
+        "form:largeurDivCenter": "",
+        # idInit identifies the planning component; use the value captured from your cURL.
+        "form:idInit": "webscolaapp.Planning_9156244072397193466",
+        "form:j_idt117_view": "agendaWeek",
+        "form:offsetFuseauNavigateur": "-3600000",
+        "form:onglets_activeIndex": "0",
+        "form:onglets_scrollState": "0",
+    },
+    quote_via=quote_plus,
+).encode("ascii")
+
+def _post_events(
+    client: httpx.Client,
+    viewstate: str,
+    start_of_week: datetime,
+    date_input: str,
+    week_label: str,
+) -> httpx.Response:
+    """Send the AJAX POST that returns the planning data for one week.
+
+    date_input and week_label reflect the moment the run started; they are
+    computed once per run by the caller rather than once per week.
+    """
+    end_of_week = start_of_week + timedelta(days=7)
+    start_ts = int(start_of_week.timestamp() * 1000)
+    end_ts = int(end_of_week.timestamp() * 1000)
+
+    # Only the date range, date fields and ViewState vary per call; append
+    # them to the pre-encoded constant part of the payload.
+    dynamic = urlencode(
+        {
+            "form:j_idt117_start": start_ts,
+            "form:j_idt117_end": end_ts,
+            "form:date_input": date_input,
+            "form:week": week_label,
+            "javax.faces.ViewState": viewstate,
+        },
+        quote_via=quote_plus,
+    )
+    body = _STATIC_PAYLOAD + b"&" + dynamic.encode("ascii")
+
+    headers = {
+        "Faces-Request": "partial/ajax",
+        "X-Requested-With": "XMLHttpRequest",
+        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+        "Accept": "application/xml, text/xml, */*; q=0.01",
+    }
+
+    request = client.build_request(
+        "POST", ENT_EVENTS_URL, content=body, headers=headers
+    )
+    return client.send(request, stream=True)
+
+def _fetch_week(
+    client: httpx.Client,
+    viewstate: str,
+    start_of_week: datetime,
+    date_input: str,
+    week_label: str,
+) -> Tuple[int, Optional[List[Dict]]]:
+    """POST one week and parse it, returning (status code, events).
+
+    The response is consumed (or closed) before this function returns, so a
+    streamed response never outlives its worker and its connection goes back
+    to the pool immediately. Events are None when the server rejected the
+    request or the body carried no parseable events JSON.
+    """
+    post_resp = _post_events(client, viewstate, start_of_week, date_input, week_label)
+    if post_resp.status_code >= 400:
+        post_resp.close()
+        return post_resp.status_code, None
+    return post_resp.status_code, _parse_events(post_resp)
+
+def _fetch_weeks(
+    client: httpx.Client, viewstate: str, weeks: List[datetime], ref_now: datetime
+) -> List[Tuple[int, Optional[List[Dict]]]]:
+    """Fetch and parse all weeks concurrently over the shared client.
+
+    The client is thread-safe; when the server speaks HTTP/2 the N week
+    fetches are multiplexed over a single TCP+TLS connection, and otherwise
+    they fall back to a keep-alive HTTP/1.1 pool. Either way they complete in
+    roughly one round-trip instead of N. Each response is read and closed
+    inside its worker, so open responses never pile up against the pool's
+    connection limit.
+    """
+    date_input = ref_now.strftime("%d/%m/%Y")
+    week_label = f"{ref_now.isocalendar().week}-{ref_now.year}"
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        return list(
+            executor.map(
+                lambda w: _fetch_week(client, viewstate, w, date_input, week_label),
+                weeks,
+            )
+        )
+
+def fetch_events(client: httpx.Client) -> List[Dict]:
+    """
+    Fetch events by performing the same AJAX POST as observed in the browser's Network tab.
+
+    Steps:
+    1. Reuse the ViewState token cached by a previous run, or request the
+       planning page to obtain a fresh one.
+    2. Build one POST payload per week of the rolling window (past week plus
+       the next four) and send them concurrently.
+    3. Parse the JSON embedded in each XML response.
+    4. Return a deduplicated list of event dicts with parsed datetime objects.
+    """
+    if not ENT_EVENTS_URL:
+        raise ValueError("ENT_EVENTS_URL environment variable must be set.")
+
+    now = datetime.now()
+    current_week = now - timedelta(days=now.weekday())
+    weeks = [current_week + timedelta(days=offset) for offset in WEEK_OFFSETS]
+
+    # Try the ViewState cached by a previous run first: if it is still valid the
+    # AJAX POSTs below succeed directly and we skip the GET of the planning page
+    # entirely, halving the number of round-trips on the happy path.
+    cache = _load_cache(client)
+    viewstate = cache.get("vs", "")
+    etag = cache.get("etag", "")
+    results = None
+    viewstate_rejected = False
+    if viewstate:
+        try:
+            fetched = _fetch_weeks(client, viewstate, weeks, now)
+        except httpx.HTTPError:
+            fetched = None
+        if fetched is not None:
+            if all(week_events is not None for _, week_events in fetched):
+                results = [week_events for _, week_events in fetched]
+            else:
+                # Expired ViewState: the server answers with an error status
+                # or a partial response without the events JSON.
+                viewstate_rejected = True
+
+    if results is None:
+        # Cold path: revalidate the planning page to get a ViewState token.
+        # A 304 means the page shell is unchanged and the cached ViewState is
+        # still good (the POSTs above failed for transport reasons, if at
+        # all); a ViewState the server just rejected is never revalidated.
+        headers = {}
+        if viewstate and not viewstate_rejected and etag:
+            headers["If-None-Match"] = etag
+        resp = client.get(ENT_EVENTS_URL, headers=headers)
+        if resp.status_code != 304:
+            resp.raise_for_status()
+            viewstate = _extract_viewstate(resp.content)
+            etag = resp.headers.get("ETag", "")
+        fetched = _fetch_weeks(client, viewstate, weeks, now)
+        for status, _ in fetched:
+            if status >= 400:
+                raise RuntimeError(
+                    f"Planning POST returned HTTP {status} with a fresh ViewState"
+                )
+        results = [week_events or [] for _, week_events in fetched]
+
+    _save_cache(client, viewstate, etag)
+
+    # Adjacent weeks can both return events straddling the boundary; merge by
+    # uid so each event appears once in the calendar. setdefault keeps the
+    # first occurrence with a single hash lookup per event.
+    merged: Dict[str, Dict] = {}
+    for week_events in results:
+        for event in week_events:
+            key = event["uid"] or f"{event['summary']}-{event['start'].isoformat()}"
+            merged.setdefault(key, event)
+    return list(merged.values())
+
+def _to_local(value: str) -> datetime:
+    """Parse an ISO datetime, attaching TIMEZONE when the value is naive.
+
+    The ENT returns local Europe/Paris wall-clock times without an offset, so
+    attaching the zone directly is both correct and much cheaper than going
+    through astimezone; values that do carry an offset are still converted.
+    """
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=TIMEZONE)
+    return dt.astimezone(TIMEZONE)
+
+# Cheap shape check applied before fromisoformat, so the per-event loop can
+# run without a try/except (raising and catching per row is far slower).
+_ISO_RE = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}")
+
+_CDATA_END = b"]]>"
+
+class _UpdatePayloadStream:
+    """File-like view of the JSON carried inside a streamed JSF response.
+
+    The partial response is XML (<partial-response><changes><update>...) with
+    the planning JSON held as CDATA in an <update> element. This wrapper skips
+    the XML preamble up to the first '{' and stops at the CDATA terminator, so
+    ijson sees a plain JSON document without the whole body ever being held in
+    memory at once.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self._chunks = chunks
+        self._buf = bytearray()
+        # Tail bytes of the previous chunk, kept in case "]]>" is split
+        # across a chunk boundary.
+        self._carry = b""
+        self._started = False
+        self._done = False
+
+    def _fill(self) -> None:
+        """Pull one chunk from the response into the buffer."""
+        try:
+            chunk = self._carry + next(self._chunks)
+        except StopIteration:
+            self._buf += self._carry
+            self._carry = b""
+            self._done = True
+            return
+        self._carry = b""
+        if not self._started:
+            pos = chunk.find(b"{")
+            if pos == -1:
+                return
+            chunk = chunk[pos:]
+            self._started = True
+        end = chunk.find(_CDATA_END)
+        if end != -1:
+            self._buf += chunk[:end]
+            self._done = True
+            return
+        self._carry = chunk[-(len(_CDATA_END) - 1):]
+        self._buf += chunk[:-(len(_CDATA_END) - 1)]
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._done and (size < 0 or len(self._buf) < size):
+            self._fill()
+        if size < 0:
+            size = len(self._buf)
+        out = bytes(self._buf[:size])
+        del self._buf[:size]
+        return out
+
+def _parse_events(post_resp: httpx.Response) -> Optional[List[Dict]]:
+    """Parse the event dicts out of one streamed AJAX response.
+
+    Returns None when the response carries no parseable events JSON (e.g. the
+    ViewState has expired and the server answered with an error page).
+    """
+    stream = _UpdatePayloadStream(post_resp.iter_bytes(chunk_size=65536))
+    events: List[Dict] = []
+    try:
+        for item in ijson.items(stream, "events.item"):
+            start_raw = item.get("start")
+            end_raw = item.get("end")
+            # Validate the shape up front so the happy path parses without a
+            # per-row try/except.
+            if not (
+                isinstance(start_raw, str) and _ISO_RE.match(start_raw)
+                and isinstance(end_raw, str) and _ISO_RE.match(end_raw)
+            ):
+                print(f"Skipping event with malformed dates: {item.get('id')!r}")
+                continue
+            events.append({
+                "uid": str(item.get("id", "")),
+                "summary": item.get("title", "Cours"),
+                "start": _to_local(start_raw),
+                "end": _to_local(end_raw),
+                "location": item.get("room", ""),
+                "description": item.get("description", ""),
+            })
+    except ijson.JSONError as e:
+        print("Failed to decode JSON from response:", e)
+        return None
+    except ValueError as e:
+        # A value that looked ISO-shaped but still failed to parse; keep what
+        # was collected so far rather than dropping the whole week.
+        print("Stopping event parse early:", e)
+    finally:
+        post_resp.close()
+    return events
+
+def _ical_escape(value: str) -> str:
+    """Escape a TEXT property value per RFC 5545 section 3.3.11."""
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+def _fold(line: str) -> str:
+    """Fold a content line longer than 75 octets (RFC 5545 section 3.1)."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        # Continuation lines start with a space, which counts toward the limit.
+        cut = 75 if not parts else 74
+        while 1 < cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+    return "\r\n ".join(parts)
+
+def _fallback_uid(e: Dict) -> str:
+    """Derive a stable UID for events the server returned without an id.
+
+    Hashing summary + start + end is cheaper than datetime.timestamp() (which
+    goes through utcoffset()) and yields the same UID regardless of timezone
+    representation, so subscribers do not see events duplicated after a tz
+    change.
+    """
+    key = f"{e['summary']}|{e['start'].isoformat()}|{e['end'].isoformat()}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest() + "@edt-sync"
+
+def build_ics(events: List[Dict]) -> bytes:
+    """Serialise the events straight to RFC 5545 text.
+
+    The icalendar object model allocates a Calendar plus an Event and several
+    property wrappers per record; for a file with one writer and one shape,
+    emitting the content lines directly is an order of magnitude cheaper.
+    """
+    tzid = TIMEZONE.key
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//EDT Sync//github.com//",
+    ]
+    for e in events:
+        uid = e["uid"] or _fallback_uid(e)
+        lines.append("BEGIN:VEVENT")
+        lines.append(_fold(f"UID:{_ical_escape(uid)}"))
+        lines.append(_fold(f"SUMMARY:{_ical_escape(e['summary'])}"))
+        lines.append(f"DTSTART;TZID={tzid}:{e['start'].strftime('%Y%m%dT%H%M%S')}")
+        lines.append(f"DTEND;TZID={tzid}:{e['end'].strftime('%Y%m%dT%H%M%S')}")
+        if e.get("location"):
+            lines.append(_fold(f"LOCATION:{_ical_escape(e['location'])}"))
+        if e.get("description"):
+            lines.append(_fold(f"DESCRIPTION:{_ical_escape(e['description'])}"))
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    lines.append("")
+    return "\r\n".join(lines).encode("utf-8")
+
+def write_calendar(calendar_bytes: bytes, path: Path) -> bool:
+    """Write the serialised calendar to the specified path.
+
+    Skips the write when the content is unchanged — committing an identical
+    docs/edt.ics would trigger a pointless GitHub Pages rebuild — and goes
+    through a temp file + os.replace so readers never see a partial file.
+    Returns True if the file was updated.
+    """
+    try:
+        old = path.read_bytes()
+    except FileNotFoundError:
+        old = b""
+    if old == calendar_bytes:
+        return False
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(calendar_bytes)
+    os.replace(tmp_path, path)
+    return True
+
+def main() -> None:
+    # HTTP/2 multiplexes the per-week POSTs over one TCP+TLS connection when
+    # the server supports it, and falls back to a keep-alive HTTP/1.1 pool
+    # otherwise. verify=False car le certificat de l'ENT n'est pas reconnu.
+    transport = httpx.HTTPTransport(
+        http2=True,
+        verify=False,
+        retries=3,
+        # One connection per week in the window plus the planning GET. httpcore
+        # enforces max_connections strictly (a request blocks until a slot
+        # frees up), so keep headroom above the worst-case concurrency.
+        limits=httpx.Limits(
+            max_connections=len(WEEK_OFFSETS) + 1,
+            max_keepalive_connections=4,
+        ),
+    )
+    client = httpx.Client(
+        transport=transport,
+        follow_redirects=True,
+        headers={
+            # brotli typically compresses the XML+JSON responses better than
+            # gzip; httpx decodes it transparently when brotli is installed.
+            "Accept-Encoding": "br, gzip, deflate",
+        },
+    )
+    login(client)
+    events = fetch_events(client)
+    print(f"Fetched {len(events)} events.")
+    calendar_bytes = build_ics(events)
+    calendar_path = Path("docs") / "edt.ics"
+    calendar_path.parent.mkdir(exist_ok=True)
+    if write_calendar(calendar_bytes, calendar_path):
+        print("Calendar written to docs/edt.ics")
+    else:
+        print("Calendar unchanged; docs/edt.ics left as is.")
+
+if __name__ == "__main__":
+    main()